@@ -10,6 +10,9 @@ import re
 import json
 import sys
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 from dataclasses import dataclass, field, asdict
 from typing import Optional
@@ -22,6 +25,21 @@ try:
 except ImportError:
     OPENAI_AVAILABLE = False
 
+# Plan sets larger than this can have their page text extracted in parallel,
+# with each worker process handling at least MIN_PAGES_PER_WORKER pages.
+# Off by default: serial extraction is quick, and every concurrent review
+# starts its own processes. Set TEXT_EXTRACTION_PROCESSES to the CPUs the
+# container can actually use to enable it.
+TEXT_EXTRACTION_PROCESSES = int(os.environ.get('TEXT_EXTRACTION_PROCESSES', 0))
+PARALLEL_PAGE_THRESHOLD = 100
+MIN_PAGES_PER_WORKER = 50
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> list:
+    """Extract text from pages [start, stop) of a PDF (runs in a worker process)"""
+    with fitz.open(pdf_path) as doc:
+        return [doc[i].get_text() for i in range(start, stop)]
+
 
 @dataclass
 class SheetInfo:
@@ -104,15 +122,29 @@ class CivilEngineeringPMAgent:
         ('right of way', 'ROW acquisition may be needed'),
     ]
 
-    def __init__(self, pdf_path: str):
-        """Initialize the agent with a plan set PDF"""
+    def __init__(self, pdf_path: str, stream=None):
+        """
+        Initialize the agent with a plan set PDF
+
+        If stream is given (bytes or a memoryview, e.g. of an mmap of pdf_path)
+        the PDF is parsed from memory instead of being read from pdf_path again.
+        """
         self.pdf_path = Path(pdf_path)
         if not self.pdf_path.exists():
             raise FileNotFoundError(f"Plan set not found: {pdf_path}")
 
-        self.doc = fitz.open(str(self.pdf_path))
+        self.doc = None
+        if stream is not None:
+            try:
+                self.doc = fitz.open(stream=stream, filetype='pdf')
+            except TypeError:
+                # Older PyMuPDF releases only accept bytes streams
+                pass
+        if self.doc is None:
+            self.doc = fitz.open(str(self.pdf_path))
         self.analysis = PlanSetAnalysis()
         self.full_text = ""
+        self.page_texts = []
 
     def __del__(self):
         """Clean up PDF document"""
@@ -121,12 +153,42 @@ class CivilEngineeringPMAgent:
 
     def extract_all_text(self) -> str:
         """Extract text from all pages"""
-        texts = []
-        for page in self.doc:
-            texts.append(page.get_text())
-        self.full_text = "\n".join(texts)
+        # Single pass over the document; per-page text is kept for reuse
+        if not self.page_texts:
+            if TEXT_EXTRACTION_PROCESSES > 1 and len(self.doc) > PARALLEL_PAGE_THRESHOLD:
+                self.page_texts = self._extract_text_parallel()
+            else:
+                self.page_texts = [page.get_text() for page in self.doc]
+        self.full_text = "\n".join(self.page_texts)
         return self.full_text
 
+    def _extract_text_parallel(self) -> list:
+        """Extract page text across worker processes, one page range each"""
+        page_count = len(self.doc)
+        workers = min(TEXT_EXTRACTION_PROCESSES, page_count // MIN_PAGES_PER_WORKER)
+        if workers < 2:
+            return [page.get_text() for page in self.doc]
+
+        step = -(-page_count // workers)  # Ceiling division
+        starts = range(0, page_count, step)
+        stops = [min(start + step, page_count) for start in starts]
+
+        try:
+            # Spawn rather than fork: the web app calls this from a threaded server
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                chunks = pool.map(_extract_page_range, repeat(str(self.pdf_path)), starts, stops)
+                return [text for chunk in chunks for text in chunk]
+        except Exception as e:
+            print(f"Parallel text extraction failed, falling back to serial: {e}")
+            return [page.get_text() for page in self.doc]
+
+    def get_page_text(self, page_num: int) -> str:
+        """Get the text of one page from the cached extraction"""
+        if not self.page_texts:
+            self.extract_all_text()
+        return self.page_texts[page_num] if page_num < len(self.page_texts) else ""
+
     def analyze_project_info(self) -> ProjectInfo:
         """Extract project identification information"""
         info = ProjectInfo()
@@ -137,7 +199,7 @@ class CivilEngineeringPMAgent:
         info.revision_date = metadata.get('modDate', '')
 
         # Parse cover sheet (usually page 1)
-        cover_text = self.doc[0].get_text() if len(self.doc) > 0 else ""
+        cover_text = self.get_page_text(0)
 
         # Extract project name - look for common patterns
         project_patterns = [
@@ -195,7 +257,7 @@ class CivilEngineeringPMAgent:
 
     def analyze_sheet_index(self) -> dict:
         """Parse the sheet index from cover sheet"""
-        cover_text = self.doc[0].get_text() if len(self.doc) > 0 else ""
+        cover_text = self.get_page_text(0)
 
         sheet_index = {}
 
@@ -361,8 +423,8 @@ class CivilEngineeringPMAgent:
         for disc in missing_disciplines:
             missing_items.append(f"Missing discipline: {disc.replace('_', ' ').title()}")
         
-        # Build concise report
-        report = f"""PLANSET REVIEW REPORT
+        # Build concise report as a list of parts, joined once at the end
+        parts = [f"""PLANSET REVIEW REPORT
 {'='*60}
 Date: {datetime.now().strftime('%Y-%m-%d')}    Sheets: {self.analysis.total_sheets}    Completeness: {self.analysis.completeness_score:.0f}%
 
@@ -378,23 +440,23 @@ Stations: {self.analysis.station_range[0] or 'N/A'} to {self.analysis.station_ra
 DISCIPLINES: {', '.join(sorted([d.replace('_', ' ').title() for d in self.analysis.disciplines_covered])) or 'None identified'}
 
 KEY FEATURES: {', '.join(sorted(self.analysis.key_features)[:8]) or 'None identified'}
-"""
+"""]
 
         # Issues/Errors Section
         if missing_items or self.analysis.review_flags:
-            report += f"""
+            parts.append(f"""
 ISSUES & FLAGS
 {'-'*60}
-"""
+""")
             if missing_items:
-                report += "Missing/Incomplete:\n"
+                parts.append("Missing/Incomplete:\n")
                 for item in missing_items[:5]:  # Limit to 5
-                    report += f"  ! {item}\n"
+                    parts.append(f"  ! {item}\n")
             
             if self.analysis.review_flags:
-                report += "Review Flags:\n"
+                parts.append("Review Flags:\n")
                 for flag in self.analysis.review_flags[:5]:  # Limit to 5
-                    report += f"  * {flag}\n"
+                    parts.append(f"  * {flag}\n")
         
         # Generate To-Do list based on findings
         todos = []
@@ -433,18 +495,18 @@ ISSUES & FLAGS
             todos.append("Conduct pre-construction meeting")
             todos.append("Identify long-lead procurement items")
         
-        report += f"""
+        parts.append(f"""
 PM TO-DO LIST
 {'-'*60}
-"""
+""")
         for i, todo in enumerate(todos[:8], 1):  # Limit to 8 items
-            report += f"  [ ] {i}. {todo}\n"
+            parts.append(f"  [ ] {i}. {todo}\n")
         
-        report += f"""
+        parts.append(f"""
 {'='*60}
 End of Report
-"""
-        return report
+""")
+        return ''.join(parts)
 
     def export_json(self) -> dict:
         """Export analysis as JSON-serializable dict"""
@@ -597,9 +659,8 @@ Be thorough and specific. Note anything that appears incomplete or requires foll
         if self.doc and len(self.doc) > 0:
             max_pages = min(5, len(self.doc))
             for i in range(max_pages):
-                page = self.doc[i]
                 sample_text += f"\n--- Page {i+1} ---\n"
-                sample_text += page.get_text()[:2000]
+                sample_text += self.get_page_text(i)[:2000]
         
         # Project info
         project_name = info.project_name or 'Project Name Not Identified'
@@ -704,7 +765,7 @@ Be specific and provide actionable comments. Return ONLY the JSON array."""
                 counts['REVIEW'] += 1
         
         # Build HTML report
-        html = f'''<!DOCTYPE html>
+        html = [f'''<!DOCTYPE html>
 <html>
 <head>
 <meta charset="UTF-8">
@@ -781,17 +842,17 @@ body {{ font-family: 'Segoe UI', Calibri, Arial, sans-serif; margin: 0; padding:
 <div class="summary-box review"><span class="count">{counts['REVIEW']}</span><span class="label">Review</span></div>
 <div class="summary-box na"><span class="count">{counts['N/A']}</span><span class="label">N/A</span></div>
 </div>
-'''
+''']
         
         # Build checklist table
         fail_items = []
         review_items = []
         
         if checklist_items_for_ai:
-            html += '''
+            html.append('''
 <table class="checklist">
 <tr><th style="width: 70px;">Status</th><th style="width: 100px;">ID</th><th style="width: 40%;">Checklist Item</th><th>Comments</th></tr>
-'''
+''')
             for item in checklist_items_for_ai:
                 eval_data = eval_dict.get(item['id'], {'status': 'REVIEW', 'comment': 'Requires manual verification'})
                 status = eval_data.get('status', 'REVIEW')
@@ -807,38 +868,38 @@ body {{ font-family: 'Segoe UI', Calibri, Arial, sans-serif; margin: 0; padding:
                 if status == 'N/A':
                     badge_class = 'badge-na'
                 
-                html += f'''<tr>
+                html.append(f'''<tr>
 <td style="text-align: center;"><span class="badge {badge_class}">{status}</span></td>
 <td style="font-family: monospace; font-size: 11px; color: #666;">{item['id']}</td>
 <td>{item['text']}</td>
 <td style="color: #666; font-style: italic;">{comment}</td>
 </tr>
-'''
-            html += '</table>\n'
+''')
+            html.append('</table>\n')
         
         # Add findings section
-        html += '''
+        html.append('''
 <div class="findings">
 <h2>Key Findings & Recommendations</h2>
-'''
+''')
         
         if fail_items:
-            html += '<h3 class="critical">Critical Issues (Action Required)</h3>\n<ul>\n'
+            html.append('<h3 class="critical">Critical Issues (Action Required)</h3>\n<ul>\n')
             for item in fail_items[:10]:
-                html += f'<li>{item}</li>\n'
-            html += '</ul>\n'
+                html.append(f'<li>{item}</li>\n')
+            html.append('</ul>\n')
         else:
-            html += '<h3 class="critical">Critical Issues</h3>\n<p>No critical issues identified.</p>\n'
+            html.append('<h3 class="critical">Critical Issues</h3>\n<p>No critical issues identified.</p>\n')
         
         if review_items:
-            html += '<h3 class="review">Items Requiring Manual Review</h3>\n<ul>\n'
+            html.append('<h3 class="review">Items Requiring Manual Review</h3>\n<ul>\n')
             for item in review_items[:10]:
-                html += f'<li>{item}</li>\n'
-            html += '</ul>\n'
+                html.append(f'<li>{item}</li>\n')
+            html.append('</ul>\n')
         else:
-            html += '<h3 class="review">Items Requiring Manual Review</h3>\n<p>No items flagged for manual review.</p>\n'
+            html.append('<h3 class="review">Items Requiring Manual Review</h3>\n<p>No items flagged for manual review.</p>\n')
         
-        html += f'''
+        html.append(f'''
 <h3>General Observations</h3>
 <p>This {checklist_phase} review evaluated {len(checklist_items_for_ai)} checklist items. 
 {counts['PASS']} items passed verification, {counts['FAIL']} items require attention, 
@@ -851,9 +912,9 @@ Generated by Abonmarche Plan Review | {review_date}
 
 </div>
 </body>
-</html>'''
+</html>''')
         
-        return html
+        return ''.join(html)
 
 
 def main():
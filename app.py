@@ -5,68 +5,344 @@ Internal use only - Abonmarche
 """
 
 import os
+import errno
+import mmap
+import shutil
 import tempfile
 import logging
 import re
-import traceback
 import json
 import uuid
+import functools
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from io import BytesIO
+from urllib.parse import urlparse
 
-from flask import Flask, render_template, request, jsonify, send_file, session
-from werkzeug.utils import secure_filename
+import requests
+from requests.adapters import HTTPAdapter
+from http.cookiejar import DefaultCookiePolicy
+from flask import Flask, Request, render_template, request, jsonify, send_file, session
+from werkzeug.exceptions import HTTPException
 
 from agent.plan_reviewer import CivilEngineeringPMAgent
 
-# Configure logging
+# Configure logging. Render/Railway/Heroku timestamp every stdout line, so
+# records skip asctime and the per-record thread/process lookups.
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    format='%(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
+# Working directory for PDFs under review. Set PLANSET_TMPDIR (e.g. to
+# /dev/shm/planset) to stage them somewhere faster than the disk temp directory.
+# tmpfs pages count against the container's memory limit, so this is opt-in.
+DISK_WORK_DIR = os.path.join(tempfile.gettempdir(), 'planset')
+WORK_DIR = os.environ.get('PLANSET_TMPDIR') or DISK_WORK_DIR
+
+os.makedirs(WORK_DIR, exist_ok=True)
+os.makedirs(DISK_WORK_DIR, exist_ok=True)
+
+# Space promised to PDFs being staged in WORK_DIR: path -> expected size.
+# Concurrent uploads and downloads all see the same free-space figure, so each
+# one reserves what it still needs to write.
+work_dir_reservations = {}
+work_dir_lock = threading.Lock()
+
+
+def new_work_path(expected_size: int = None) -> str:
+    """
+    Return a unique path for a PDF under review
+    
+    Falls back to the disk temp directory when the size is unknown or the
+    working directory (often a small tmpfs) lacks the unreserved space.
+    """
+    name = f'planset_{uuid.uuid4().hex}.pdf'
+    if WORK_DIR == DISK_WORK_DIR or not expected_size:
+        return os.path.join(DISK_WORK_DIR, name)
+    
+    with work_dir_lock:
+        # Bytes already written are reflected in the free space; count only
+        # what each staged file has yet to write. A reservation whose file is
+        # gone (e.g. removed by the janitor) no longer holds any space.
+        outstanding = 0
+        for path, size in list(work_dir_reservations.items()):
+            try:
+                outstanding += max(0, size - os.path.getsize(path))
+            except OSError:
+                work_dir_reservations.pop(path, None)
+        
+        if shutil.disk_usage(WORK_DIR).free - outstanding <= expected_size:
+            return os.path.join(DISK_WORK_DIR, name)
+        
+        # Create the file while holding the lock so the reservation is never
+        # mistaken for one whose file has been removed
+        path = os.path.join(WORK_DIR, name)
+        open(path, 'xb').close()
+        work_dir_reservations[path] = expected_size
+        return path
+
+
+def release_work_path(path: str):
+    """Drop the space reservation for a staged PDF"""
+    with work_dir_lock:
+        work_dir_reservations.pop(path, None)
+
+
+def remove_work_file(path: str):
+    """Delete a staged PDF and release its reservation"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    release_work_path(path)
+
+
+class WorkFile:
+    """
+    Staged PDF opened for writing
+    
+    If the working directory runs out of space mid-write (ENOSPC), the
+    partial file is moved to the disk temp directory and writing carries on.
+    """
+    
+    def __init__(self, expected_size: int = None):
+        self.name = new_work_path(expected_size)
+        self._file = open(self.name, 'wb+', buffering=0)
+    
+    def write(self, data) -> int:
+        # Unbuffered, so an ENOSPC is raised here rather than on a later
+        # flush and the file holds exactly what has been written so far
+        view = memoryview(data)
+        written = 0
+        while written < len(view):
+            try:
+                written += self._file.write(view[written:])
+            except OSError as e:
+                if e.errno != errno.ENOSPC or os.path.dirname(self.name) == DISK_WORK_DIR:
+                    raise
+                self._move_to_disk()
+        return written
+    
+    def _move_to_disk(self):
+        logger.warning(f"Working directory full, moving {os.path.basename(self.name)} to disk")
+        disk_path = os.path.join(DISK_WORK_DIR, os.path.basename(self.name))
+        disk_file = open(disk_path, 'wb+', buffering=0)
+        try:
+            self._file.seek(0)
+            shutil.copyfileobj(self._file, disk_file, DOWNLOAD_CHUNK_SIZE)
+        except BaseException:
+            disk_file.close()
+            os.remove(disk_path)
+            raise
+        self._file.close()
+        remove_work_file(self.name)
+        self.name, self._file = disk_path, disk_file
+    
+    def __getattr__(self, attr):
+        return getattr(self._file, attr)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._file.close()
+
+
+# Orphaned review PDFs (e.g. left by a crashed worker) are swept periodically
+TEMP_RETENTION_SECONDS = int(os.environ.get('PLANSET_TMP_RETENTION_MINUTES', 30)) * 60
+JANITOR_INTERVAL_SECONDS = 5 * 60
+
+
+def cleanup_work_dirs(max_age: float = TEMP_RETENTION_SECONDS) -> int:
+    """Delete review PDFs not modified in the last max_age seconds"""
+    cutoff = time.time() - max_age
+    removed = 0
+    
+    # A queued job's PDF can sit untouched for longer than the retention
+    # period, so files owned by unfinished jobs are never swept
+    in_use = {job['pdf_path'] for job in list(review_jobs.values()) if 'finished' not in job}
+    
+    for work_dir in {WORK_DIR, DISK_WORK_DIR}:
+        for path in Path(work_dir).glob('planset_*.pdf'):
+            if str(path) in in_use:
+                continue
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    release_work_path(str(path))
+                    removed += 1
+            except OSError:
+                pass
+    
+    if removed:
+        logger.info(f"Removed {removed} orphaned temp file(s)")
+    return removed
+
+
+def _janitor_loop():
+    """Background loop that sweeps the working directories"""
+    while True:
+        try:
+            cleanup_work_dirs()
+        except Exception as e:
+            logger.error(f"Temp cleanup error: {e}")
+        time.sleep(JANITOR_INTERVAL_SECONDS)
+
+
+class UploadRequest(Request):
+    """Request that writes file uploads straight to a temp file on disk"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Every file staged while parsing the form, including those from a
+        # parse that failed partway and so never reached request.files
+        self.work_files = []
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Werkzeug's default spools uploads through a SpooledTemporaryFile, which
+        # file.save() then copies again. Parse each upload directly into the file
+        # that will be analyzed instead.
+        work_file = WorkFile(total_content_length)
+        self.work_files.append(work_file)
+        return work_file
+
+
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max upload
 app.secret_key = os.environ.get('SECRET_KEY', 'planset-review-secret-key-change-in-prod')
 
 # In-memory storage for review history (per session)
 review_history = {}
 
+# Background review jobs, keyed by task ID. Like review history this lives in
+# process memory, so the app is served by a single (multi-threaded) worker.
+review_jobs = {}
+JOB_RETENTION_SECONDS = 60 * 60  # Keep finished results for an hour
+ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', 2))
+analysis_executor = ThreadPoolExecutor(
+    max_workers=ANALYSIS_WORKERS,
+    thread_name_prefix='analysis'
+)
+
+# Spawned text-extraction processes re-import this module as __mp_main__
+# when the app is run directly; only the server process needs a janitor
+if __name__ != '__mp_main__':
+    threading.Thread(target=_janitor_loop, name='tmp-janitor', daemon=True).start()
+
+# Backpressure: cap reviews in flight (running or queued, each holding a staged
+# PDF) and concurrent share-link downloads. Requests beyond this get a 503.
+MAX_PENDING_REVIEWS = int(os.environ.get('MAX_PENDING_REVIEWS', ANALYSIS_WORKERS + 8))
+MAX_CONCURRENT_DOWNLOADS = int(os.environ.get('MAX_CONCURRENT_DOWNLOADS', 8))
+DOWNLOAD_SLOT_TIMEOUT = 30  # seconds to wait for a free download slot
+review_slots = threading.BoundedSemaphore(MAX_PENDING_REVIEWS)
+download_slots = threading.BoundedSemaphore(MAX_CONCURRENT_DOWNLOADS)
+
 # Allowed extensions
-ALLOWED_EXTENSIONS = {'.pdf'}
+ALLOWED_EXTENSIONS = ('.pdf',)
 
-# OneDrive/SharePoint URL patterns
-SHARE_URL_PATTERNS = [
-    r'https?://[a-zA-Z0-9-]+\.sharepoint\.com/.*',
-    r'https?://[a-zA-Z0-9-]+-my\.sharepoint\.com/.*',
-    r'https?://onedrive\.live\.com/.*',
-    r'https?://1drv\.ms/.*',
-]
+# Chunk size for streaming downloads to disk
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+# Shared HTTP session so downloads reuse pooled keep-alive connections.
+# Cookies are not kept between calls so one user's link never sees another's.
+http_session = requests.Session()
+http_session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+http_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32)
+http_session.mount('https://', http_adapter)
+http_session.mount('http://', http_adapter)
+
+# Resolved 1drv.ms short links: url -> (target url, expiry time). Re-shared
+# links skip the redirect round-trip while the target is still valid.
+resolved_short_links = {}
+SHORT_LINK_TTL_SECONDS = 5 * 60
+
+# OneDrive/SharePoint hosts (and their subdomains), checked before running
+# the full pattern
+SHARE_URL_HOSTS = ('sharepoint.com', 'onedrive.live.com', '1drv.ms')
+
+# Hosts a 1drv.ms short link may resolve to (OneDrive serves files from *.1drv.com)
+SHORT_LINK_TARGET_HOSTS = SHARE_URL_HOSTS + ('1drv.com',)
+
+# OneDrive/SharePoint URL pattern (covers tenant and -my personal sites)
+SHARE_URL_RE = re.compile(
+    r'https?://(?:[a-zA-Z0-9-]+\.sharepoint\.com|onedrive\.live\.com|1drv\.ms)/',
+    re.IGNORECASE
+)
+
+# Filename in a Content-Disposition header
+CONTENT_DISPOSITION_FILENAME_RE = re.compile(r'filename[*]?=["\']?([^"\';\n]+)')
 
 
 def allowed_file(filename: str) -> bool:
     """Check if file has allowed extension"""
-    return Path(filename).suffix.lower() in ALLOWED_EXTENSIONS
+    return filename.lower().endswith(ALLOWED_EXTENSIONS)
+
+
+def host_matches(host: str, hosts: tuple) -> bool:
+    """Check if host is one of hosts or a subdomain of one"""
+    return any(host == h or host.endswith('.' + h) for h in hosts)
 
 
 def is_share_url(text: str) -> bool:
     """Check if text is a OneDrive/SharePoint URL"""
-    for pattern in SHARE_URL_PATTERNS:
-        if re.match(pattern, text.strip(), re.IGNORECASE):
-            return True
-    return False
+    text = text.strip()
+    
+    # Cheap rejection of anything that isn't a URL on a known host
+    if text[:4].lower() != 'http':
+        return False
+    try:
+        host = urlparse(text).hostname or ''
+    except ValueError:
+        return False
+    if not host_matches(host, SHARE_URL_HOSTS):
+        return False
+    
+    return SHARE_URL_RE.match(text) is not None
+
+
+def resolve_short_link(url: str) -> str:
+    """Follow a 1drv.ms short link, caching the target briefly if it's valid"""
+    now = time.time()
+    cached = resolved_short_links.get(url)
+    if cached and cached[1] > now:
+        return cached[0]
+    
+    response = http_session.head(url, allow_redirects=True, timeout=30)
+    
+    # Only fetch from OneDrive itself; a sign-in page or any other host
+    # means the link isn't publicly shared. Not cached, so a retry after
+    # the link is re-shared goes back to the server.
+    if not host_matches(urlparse(response.url).hostname or '', SHORT_LINK_TARGET_HOSTS):
+        raise Exception(
+            "The short link did not lead to a OneDrive file. "
+            "Check that anyone with the link can view it."
+        )
+    
+    # Drop expired entries before adding the new one
+    for key, (_, expires) in list(resolved_short_links.items()):
+        if expires <= now:
+            resolved_short_links.pop(key, None)
+    resolved_short_links[url] = (response.url, now + SHORT_LINK_TTL_SECONDS)
+    
+    return response.url
 
 
 def download_from_share_url(url: str) -> tuple[str, str]:
     """
     Download a file from OneDrive/SharePoint sharing URL
     
-    Returns tuple of (local_path, filename)
+    Returns tuple of (local_path, filename), where filename is the name the
+    server reported, for display only
     """
-    import requests
-    
     url = url.strip()
     logger.info(f"Attempting to download from: {url}")
     
@@ -77,8 +353,7 @@ def download_from_share_url(url: str) -> tuple[str, str]:
     # Handle different URL formats
     if '1drv.ms' in url:
         # Short URL - need to follow redirect
-        response = requests.head(url, allow_redirects=True)
-        download_url = response.url
+        download_url = resolve_short_link(url)
     
     # Try to convert to direct download URL
     if 'sharepoint.com' in download_url or 'onedrive.live.com' in download_url:
@@ -99,44 +374,84 @@ def download_from_share_url(url: str) -> tuple[str, str]:
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
     }
     
-    response = requests.get(download_url, headers=headers, stream=True, timeout=300)
-    
-    if response.status_code != 200:
-        raise Exception(f"Failed to download file: HTTP {response.status_code}")
-    
-    # Try to get filename from headers
-    content_disposition = response.headers.get('Content-Disposition', '')
-    filename = 'planset.pdf'
-    
-    if 'filename=' in content_disposition:
-        # Extract filename from header
-        match = re.search(r'filename[*]?=["\']?([^"\';\n]+)', content_disposition)
-        if match:
-            filename = match.group(1).strip()
-    
-    # Verify it's a PDF
-    content_type = response.headers.get('Content-Type', '')
-    if 'pdf' not in content_type.lower() and not filename.lower().endswith('.pdf'):
-        # Check first bytes for PDF signature
-        first_bytes = response.content[:5]
-        if first_bytes != b'%PDF-':
-            raise Exception("The shared file does not appear to be a PDF")
-    
-    # Save to temp file
-    temp_dir = tempfile.mkdtemp()
-    safe_filename = secure_filename(filename)
-    if not safe_filename.lower().endswith('.pdf'):
-        safe_filename += '.pdf'
-    
-    local_path = os.path.join(temp_dir, safe_filename)
-    
-    with open(local_path, 'wb') as f:
-        f.write(response.content)
-    
-    file_size = os.path.getsize(local_path)
-    logger.info(f"Downloaded {safe_filename} ({file_size} bytes)")
+    try:
+        with http_session.get(download_url, headers=headers, stream=True, timeout=300) as response:
+            if response.status_code != 200:
+                raise Exception(f"Failed to download file: HTTP {response.status_code}")
+            
+            # Reject oversized files and web pages (e.g. a sign-in page) from the
+            # headers alone, before any of the body is transferred
+            max_size = app.config['MAX_CONTENT_LENGTH']
+            content_length = int(response.headers.get('Content-Length') or 0)
+            if content_length > max_size:
+                raise Exception(
+                    f"File is too large ({content_length // (1024 * 1024)}MB). "
+                    f"Maximum size is {max_size // (1024 * 1024)}MB."
+                )
+            
+            content_type = response.headers.get('Content-Type', '')
+            if content_type.lower().startswith('text/'):
+                raise Exception(
+                    "The link returned a web page instead of a file. "
+                    "Check that anyone with the link can view it."
+                )
+            
+            # Try to get filename from headers
+            content_disposition = response.headers.get('Content-Disposition', '')
+            filename = 'planset.pdf'
+            
+            if 'filename=' in content_disposition:
+                # Extract filename from header
+                match = CONTENT_DISPOSITION_FILENAME_RE.search(content_disposition)
+                if match:
+                    filename = match.group(1).strip()
+            
+            # Peek at the first chunk of the body without buffering the rest
+            response.raw.decode_content = True
+            first_chunk = response.raw.read(DOWNLOAD_CHUNK_SIZE)
+            
+            # Verify it's a PDF
+            if 'pdf' not in content_type.lower() and not filename.lower().endswith('.pdf'):
+                # Check first bytes for PDF signature
+                if not first_chunk.startswith(b'%PDF-'):
+                    raise Exception("The shared file does not appear to be a PDF")
+            
+            # Save to temp file (named by UUID; the original name is for display).
+            # Stream to disk in 1 MiB chunks so the PDF is never held in memory.
+            # Reading the raw urllib3 stream skips iter_content's generator overhead.
+            # Content-Length is the encoded size when the body is compressed, so
+            # only an identity-encoded length says how much space to set aside.
+            if response.headers.get('Content-Encoding', 'identity').lower() != 'identity':
+                content_length = None
+            f = WorkFile(content_length)
+            try:
+                with f:
+                    chunk = first_chunk
+                    while chunk:
+                        f.write(chunk)
+                        # The header may be missing (chunked) or give the
+                        # compressed size, so enforce the limit on what arrives
+                        if f.tell() > max_size:
+                            raise Exception(
+                                f"File is too large. Maximum size is {max_size // (1024 * 1024)}MB."
+                            )
+                        chunk = response.raw.read(DOWNLOAD_CHUNK_SIZE)
+                    file_size = f.tell()
+            except BaseException:
+                # The caller never learns the path, so don't leave a partial file
+                remove_work_file(f.name)
+                raise
+            # The file may have moved to disk if the working directory filled up
+            local_path = f.name
+    except BaseException:
+        # The cached redirect target may have expired or been revoked, so
+        # a retry after any failure resolves the short link again
+        resolved_short_links.pop(url, None)
+        raise
+
+    logger.info(f"Downloaded {filename} ({file_size} bytes)")
     
-    return local_path, safe_filename
+    return local_path, filename
 
 
 def analyze_planset(pdf_path: str, use_vision: bool = True, checklist: dict = None, custom_instructions: str = "") -> dict:
@@ -144,7 +459,11 @@ def analyze_planset(pdf_path: str, use_vision: bool = True, checklist: dict = No
     Analyze a planset PDF and return results
     """
     try:
-        agent = CivilEngineeringPMAgent(pdf_path)
+        # Map the staged file and let PyMuPDF parse it from memory. The mapping
+        # is released along with the agent when this function returns.
+        with open(pdf_path, 'rb') as f:
+            pdf_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        agent = CivilEngineeringPMAgent(pdf_path, stream=memoryview(pdf_map))
         
         # Get page count
         page_count = len(agent.doc)
@@ -174,13 +493,43 @@ def analyze_planset(pdf_path: str, use_vision: bool = True, checklist: dict = No
             'project_name': project_name
         }
     except Exception as e:
-        logger.error(f"Analysis error: {e}\n{traceback.format_exc()}")
+        logger.exception(f"Analysis error: {e}")
         return {
             'success': False,
             'error': str(e)
         }
 
 
+def run_review_job(task_id: str, pdf_path: str, filename: str, **options):
+    """Run an analysis in the background and record its result"""
+    job = review_jobs[task_id]
+    job['state'] = 'running'
+    try:
+        result = analyze_planset(pdf_path, **options)
+        result['filename'] = filename
+        job['result'] = result
+        job['state'] = 'complete' if result['success'] else 'failed'
+    finally:
+        job['finished'] = time.time()
+        # The job owns the temp file once submitted
+        remove_work_file(pdf_path)
+        review_slots.release()
+
+
+def submit_review_job(pdf_path: str, filename: str, **options) -> str:
+    """Queue a planset for analysis and return its task ID"""
+    # Drop finished jobs nobody has collected
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    for task_id, job in list(review_jobs.items()):
+        if job.get('finished') and job['finished'] < cutoff:
+            review_jobs.pop(task_id, None)
+
+    task_id = uuid.uuid4().hex
+    review_jobs[task_id] = {'state': 'queued', 'created': time.time(), 'pdf_path': pdf_path}
+    analysis_executor.submit(run_review_job, task_id, pdf_path, filename, **options)
+    return task_id
+
+
 @app.route('/')
 def index():
     """Main page"""
@@ -190,9 +539,19 @@ def index():
 @app.route('/api/review', methods=['POST'])
 def review_planset():
     """
-    Review a planset from either file upload or URL
+    Queue a planset review from either file upload or URL
+
+    Returns a task ID immediately; poll /api/review/<task_id> for the result.
     """
+    # Refuse new reviews while the queue is full, before the upload is parsed
+    if not review_slots.acquire(blocking=False):
+        return jsonify({
+            'success': False,
+            'error': 'The server is busy with other reviews. Please try again in a few minutes.'
+        }), 503
+    
     temp_path = None
+    job_path = None
     
     try:
         # Check if URL was provided
@@ -206,6 +565,12 @@ def review_planset():
                     'error': 'Invalid URL. Please provide a OneDrive or SharePoint sharing link.'
                 }), 400
             
+            if not download_slots.acquire(timeout=DOWNLOAD_SLOT_TIMEOUT):
+                return jsonify({
+                    'success': False,
+                    'error': 'Too many downloads in progress. Please try again in a few minutes.'
+                }), 503
+            
             try:
                 temp_path, filename = download_from_share_url(share_url)
             except Exception as e:
@@ -214,10 +579,15 @@ def review_planset():
                     'success': False,
                     'error': f'Failed to download file: {str(e)}'
                 }), 400
+            finally:
+                download_slots.release()
         
         elif 'file' in request.files:
-            # Handle file upload
+            # Handle file upload - already written to disk while parsing the form
             file = request.files['file']
+            file.close()
+            temp_path = file.stream.name
+            filename = file.filename
             
             if file.filename == '':
                 return jsonify({
@@ -231,13 +601,7 @@ def review_planset():
                     'error': 'Invalid file type. Please upload a PDF file.'
                 }), 400
             
-            # Save uploaded file
-            temp_dir = tempfile.mkdtemp()
-            filename = secure_filename(file.filename)
-            temp_path = os.path.join(temp_dir, filename)
-            file.save(temp_path)
-            
-            logger.info(f"Saved uploaded file: {filename}")
+            logger.info(f"Received uploaded file: {filename}")
         
         else:
             return jsonify({
@@ -257,40 +621,71 @@ def review_planset():
             if checklist:
                 logger.info(f"Loaded checklist: {checklist_id} with {len(checklist.get('items', []))} items")
         
-        # Analyze the planset
-        result = analyze_planset(
+        # Hand the temp file off to a background analysis job
+        task_id = submit_review_job(
             temp_path,
+            filename,
             use_vision=use_vision,
             checklist=checklist,
             custom_instructions=custom_instructions
         )
+        job_path, temp_path = temp_path, None
         
-        if result['success']:
-            return jsonify(result)
-        else:
-            return jsonify(result), 500
+        return jsonify({'success': True, 'task_id': task_id, 'state': 'queued'}), 202
+    
+    except HTTPException as e:
+        # Form parsing failed (e.g. upload too large or client disconnected)
+        logger.warning(f"Review request rejected: {e}")
+        return jsonify({
+            'success': False,
+            'error': e.description
+        }), e.code
     
     except Exception as e:
-        logger.error(f"Review error: {e}\n{traceback.format_exc()}")
+        logger.exception(f"Review error: {e}")
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
     
     finally:
+        # A submitted job releases its own slot when it finishes
+        if job_path is None:
+            review_slots.release()
+        
         # Clean up temp file
-        if temp_path and os.path.exists(temp_path):
-            try:
-                os.remove(temp_path)
-                os.rmdir(os.path.dirname(temp_path))
-            except Exception:
-                pass
+        if temp_path:
+            remove_work_file(temp_path)
+
+        # Remove any other uploaded parts that were spooled to disk. Reading
+        # request.files here would re-run a form parse that already failed.
+        for work_file in request.work_files:
+            work_file.close()
+            if work_file.name != job_path:
+                remove_work_file(work_file.name)
+
+
+@app.route('/api/review/<task_id>', methods=['GET'])
+def get_review_status(task_id):
+    """Get the state of a queued review, including the result once finished"""
+    job = review_jobs.get(task_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Review not found'}), 404
+    
+    if job['state'] in ('complete', 'failed'):
+        return jsonify({'state': job['state'], **job['result']})
+    
+    return jsonify({'success': True, 'state': job['state']})
+
+
+# Health probes are frequent, so the response body is built once
+HEALTH_BODY = json.dumps({'status': 'healthy'}).encode()
 
 
 @app.route('/health')
 def health():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy'})
+    return app.response_class(HEALTH_BODY, mimetype='application/json')
 
 
 @app.route('/api/export/word', methods=['POST'])
@@ -361,7 +756,7 @@ def export_word():
         )
         
     except Exception as e:
-        logger.error(f"Word export error: {e}\n{traceback.format_exc()}")
+        logger.exception(f"Word export error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -483,7 +878,7 @@ def export_pdf():
         )
         
     except Exception as e:
-        logger.error(f"PDF export error: {e}\n{traceback.format_exc()}")
+        logger.exception(f"PDF export error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -588,8 +983,6 @@ def send_email():
 
 def load_checklist_from_file(checklist_id: str) -> dict:
     """Load a checklist from JSON file"""
-    checklist_dir = Path(__file__).parent / 'checklists'
-    
     # Map checklist IDs to filenames
     checklist_files = {
         '30_percent': '30_percent.json',
@@ -602,7 +995,18 @@ def load_checklist_from_file(checklist_id: str) -> dict:
     if not filename:
         return None
     
-    filepath = checklist_dir / filename
+    return _read_checklist(filename)
+
+
+@functools.lru_cache(maxsize=None)
+def _read_checklist(filename: str) -> dict:
+    """
+    Read and flatten a checklist JSON file
+    
+    Checklists ship with the app, so each is parsed once and the same dict is
+    returned on later calls. Callers must not modify it.
+    """
+    filepath = Path(__file__).parent / 'checklists' / filename
     if not filepath.exists():
         logger.warning(f"Checklist file not found: {filepath}")
         return None
@@ -631,7 +1035,7 @@ def load_checklist_from_file(checklist_id: str) -> dict:
             'items': all_items  # Flattened for compatibility
         }
     except Exception as e:
-        logger.error(f"Error loading checklist {checklist_id}: {e}")
+        logger.error(f"Error loading checklist {filename}: {e}")
         return None
 
 
@@ -0,0 +1,20 @@
+"""
+Gunicorn configuration for the PlanSet Review Agent
+Loaded automatically by `gunicorn app:app` (Procfile, railway.json, render.yaml)
+"""
+
+import os
+
+# Review jobs and history are kept in process memory, so run a single worker
+# process and get concurrency from threads. Analyses run on the app's own
+# executor, so request threads only handle uploads, downloads and polling.
+workers = 1
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+
+# Allow time for 500MB uploads and share-link downloads
+timeout = 600
+
+# Keep the worker heartbeat file off disk
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'